@@ -5,7 +5,7 @@ Ingests DNS logs from Zeek/Suricata and forwards them for processing.
 
 import asyncio
 import json
-from typing import Dict, List, Optional, Callable
+from typing import AsyncIterator, Dict, List, Optional, Callable
 from datetime import datetime
 from pathlib import Path
 import aiofiles
@@ -88,15 +88,59 @@ class LogCollector:
     - Direct API ingestion
     """
     
-    def __init__(self, callback: Optional[Callable] = None):
+    # Bytes of new log data read per file read while tailing
+    READ_CHUNK_SIZE = 64 * 1024
+    
+    def __init__(self, callback: Optional[Callable] = None,
+                 queue: Optional[asyncio.Queue] = None):
         """
         Args:
             callback: Async function to call with each parsed record
+            queue: Queue each parsed record is put on; a bounded queue makes
+                tailing wait while the consumer is behind
         """
         self.callback = callback
+        self.queue = queue
         self.running = False
         self.parser = ZeekLogParser()
     
+    async def _emit(self, record: Dict):
+        """Hand a parsed record to the queue and/or callback."""
+        if self.queue is not None:
+            await self.queue.put(record)
+        if self.callback:
+            await self.callback(record)
+    
+    async def _tail_lines(self, log_path: str, interval: float) -> AsyncIterator[str]:
+        """
+        Yield complete lines appended to a file after it is opened.
+        
+        All data available on each wake-up is read in chunks of
+        READ_CHUNK_SIZE rather than one threaded readline() per line; a
+        partially written last line is held back until its newline arrives.
+        
+        Args:
+            log_path: Path to the log file
+            interval: Polling interval in seconds when no new data is available
+        """
+        async with aiofiles.open(log_path, 'r') as f:
+            # Seek to end of file (only read new lines)
+            await f.seek(0, 2)
+            pending = ''
+            
+            while self.running:
+                chunk = await f.read(self.READ_CHUNK_SIZE)
+                
+                if not chunk:
+                    # No new data, wait before next check
+                    await asyncio.sleep(interval)
+                    continue
+                
+                lines = (pending + chunk).split('\n')
+                pending = lines.pop()
+                for line in lines:
+                    yield line
+    
     async def tail_zeek_log(self, log_path: str, interval: float = 1.0):
         """
         Tail a Zeek DNS log file and stream records.
@@ -116,21 +160,11 @@ class LogCollector:
             await asyncio.sleep(interval)
         
         try:
-            async with aiofiles.open(log_path, 'r') as f:
-                # Seek to end of file (only read new lines)
-                await f.seek(0, 2)
-                
-                while self.running:
-                    line = await f.readline()
-                    
-                    if line:
-                        # Parse and process line
-                        record = self.parser.parse_line(line)
-                        if record and self.callback:
-                            await self.callback(record)
-                    else:
-                        # No new data, wait before next check
-                        await asyncio.sleep(interval)
+            async for line in self._tail_lines(log_path, interval):
+                # Parse and process line
+                record = self.parser.parse_line(line)
+                if record:
+                    await self._emit(record)
                         
         except Exception as e:
             logger.error(f"Error tailing log: {e}")
@@ -151,10 +185,13 @@ class LogCollector:
         
         try:
             async with aiofiles.open(log_path, 'r') as f:
-                async for line in f:
-                    record = self.parser.parse_line(line)
-                    if record:
-                        records.append(record)
+                content = await f.read()
+            
+            # One threaded read for the whole file, then parse in memory
+            for line in content.splitlines():
+                record = self.parser.parse_line(line)
+                if record:
+                    records.append(record)
                         
             logger.info(f"Read {len(records)} records from {log_path}")
             return records
@@ -181,33 +218,24 @@ class LogCollector:
             await asyncio.sleep(interval)
         
         try:
-            async with aiofiles.open(log_path, 'r') as f:
-                await f.seek(0, 2)
-                
-                while self.running:
-                    line = await f.readline()
+            async for line in self._tail_lines(log_path, interval):
+                try:
+                    record = json.loads(line.strip())
                     
-                    if line:
-                        try:
-                            record = json.loads(line.strip())
+                    # Ensure required fields exist
+                    if 'query' in record and 'client_ip' in record:
+                        # Parse timestamp if string
+                        if isinstance(record.get('timestamp'), str):
+                            record['timestamp'] = datetime.fromisoformat(
+                                record['timestamp'].replace('Z', '+00:00')
+                            )
+                        elif 'timestamp' not in record:
+                            record['timestamp'] = datetime.utcnow()
+                        
+                        await self._emit(record)
                             
-                            # Ensure required fields exist
-                            if 'query' in record and 'client_ip' in record:
-                                # Parse timestamp if string
-                                if isinstance(record.get('timestamp'), str):
-                                    record['timestamp'] = datetime.fromisoformat(
-                                        record['timestamp'].replace('Z', '+00:00')
-                                    )
-                                elif 'timestamp' not in record:
-                                    record['timestamp'] = datetime.utcnow()
-                                
-                                if self.callback:
-                                    await self.callback(record)
-                                    
-                        except json.JSONDecodeError as e:
-                            logger.debug(f"Invalid JSON line: {e}")
-                    else:
-                        await asyncio.sleep(interval)
+                except json.JSONDecodeError as e:
+                    logger.debug(f"Invalid JSON line: {e}")
                         
         except Exception as e:
             logger.error(f"Error tailing JSON log: {e}")
@@ -6,7 +6,8 @@ Computes DNS query features for anomaly detection.
 import math
 import re
 from collections import defaultdict
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
@@ -29,6 +30,10 @@ class FeatureExtractor:
     - max_entropy: Maximum entropy in time window
     """
     
+    QUERY_CACHE_SIZE = 131072
+    # Bump whenever feature values change so cached training features are rebuilt
+    FEATURE_VERSION = 1
+    
     def __init__(self, window_size: int = 60):
         """
         Args:
@@ -50,24 +55,46 @@ class FeatureExtractor:
         Returns:
             Dictionary of feature values
         """
+        return self._add_window_features(
+            dict(self._query_features(query)), query, client_ip, timestamp
+        )
+    
+    @staticmethod
+    @lru_cache(maxsize=QUERY_CACHE_SIZE)
+    def _query_features(query: str) -> Dict[str, float]:
+        """
+        Compute the features that depend only on the query string.
+        
+        Popular domains recur constantly, so results are memoized in one
+        process-wide cache shared by every extractor (and inherited by forked
+        workers); per-client window state stays per instance.
+        """
+        return {
+            'len_q': FeatureExtractor._get_length(query),
+            'entropy': FeatureExtractor._calculate_entropy(query),
+            'num_labels': FeatureExtractor._count_labels(query),
+            'max_label_len': FeatureExtractor._max_label_length(query),
+            'digits_ratio': FeatureExtractor._digits_ratio(query),
+            'non_alnum_ratio': FeatureExtractor._non_alphanumeric_ratio(query),
+        }
+    
+    def _add_window_features(self, features: Dict[str, float], query: str,
+                             client_ip: str, timestamp: Optional[datetime]) -> Dict[str, float]:
+        """Record the query in the client's window and add window-based features."""
+        features.update(self._update_window(query, features['entropy'], client_ip, timestamp))
+        return features
+    
+    def _update_window(self, query: str, entropy: float, client_ip: str,
+                       timestamp: Optional[datetime]) -> Dict[str, float]:
+        """Record the query in the client's window and return window-based features."""
         if timestamp is None:
             timestamp = datetime.utcnow()
-            
-        # Per-query features
-        features = {
-            'len_q': self._get_length(query),
-            'entropy': self._calculate_entropy(query),
-            'num_labels': self._count_labels(query),
-            'max_label_len': self._max_label_length(query),
-            'digits_ratio': self._digits_ratio(query),
-            'non_alnum_ratio': self._non_alphanumeric_ratio(query),
-        }
         
         # Store query in history for window-based features
         query_record = {
             'query': query,
             'timestamp': timestamp,
-            'entropy': features['entropy']
+            'entropy': entropy
         }
         self.query_history[client_ip].append(query_record)
         
@@ -75,16 +102,15 @@ class FeatureExtractor:
         self._clean_old_queries(client_ip, timestamp)
         
         # Window-based features
-        window_features = self._extract_window_features(client_ip)
-        features.update(window_features)
-        
-        return features
+        return self._extract_window_features(client_ip)
     
-    def _get_length(self, query: str) -> int:
+    @staticmethod
+    def _get_length(query: str) -> int:
         """Get query length."""
         return len(query)
     
-    def _calculate_entropy(self, query: str) -> float:
+    @staticmethod
+    def _calculate_entropy(query: str) -> float:
         """
         Calculate Shannon entropy of the query string.
         Higher entropy indicates more randomness (common in tunneling).
@@ -107,23 +133,74 @@ class FeatureExtractor:
                 
         return entropy
     
-    def _count_labels(self, query: str) -> int:
+    def _batch_entropy(self, queries: List[str]) -> np.ndarray:
+        """
+        Calculate Shannon entropy for many queries in one vectorized pass.
+        
+        Characters of all queries are packed into one code point array and
+        counted per (query, character) pair, so no Python loop runs per character.
+        """
+        lengths = np.fromiter((len(q) for q in queries), dtype=np.int64, count=len(queries))
+        codes = np.frombuffer(''.join(queries).encode('utf-32-le'), dtype='<u4')
+        rows = np.repeat(np.arange(len(queries), dtype=np.int64), lengths)
+        
+        # Code points fit in 21 bits, so (row, char) packs into one int64 key
+        keys, counts = np.unique((rows << 21) | codes, return_counts=True)
+        key_rows = keys >> 21
+        
+        probs = counts / lengths[key_rows]
+        return -np.bincount(key_rows, weights=probs * np.log2(probs), minlength=len(queries))
+    
+    def _batch_query_features(self, queries: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Compute the per-query features for many queries as column arrays.
+        
+        Counting runs through C-level str methods and map() per query, and the
+        ratios are then computed on whole NumPy arrays.
+        """
+        n = len(queries)
+        lengths = np.fromiter(map(len, queries), dtype=np.int64, count=n)
+        num_labels = np.fromiter((q.count('.') + 1 for q in queries), dtype=np.int64, count=n)
+        max_label_len = np.fromiter(
+            (max(map(len, q.split('.'))) for q in queries), dtype=np.int64, count=n
+        )
+        digits = np.fromiter((sum(map(str.isdigit, q)) for q in queries), dtype=np.int64, count=n)
+        alnum = np.fromiter((sum(map(str.isalnum, q)) for q in queries), dtype=np.int64, count=n)
+        
+        # Dots are neither alphanumeric nor counted as non-alphanumeric
+        non_alnum = lengths - alnum - (num_labels - 1)
+        safe_lengths = np.maximum(lengths, 1)
+        
+        return {
+            'len_q': lengths,
+            'entropy': self._batch_entropy(queries),
+            'num_labels': num_labels,
+            'max_label_len': max_label_len,
+            'digits_ratio': np.where(lengths > 0, digits / safe_lengths, 0.0),
+            'non_alnum_ratio': np.where(lengths > 0, non_alnum / safe_lengths, 0.0),
+        }
+    
+    @staticmethod
+    def _count_labels(query: str) -> int:
         """Count number of DNS labels (subdomains)."""
         return query.count('.') + 1
     
-    def _max_label_length(self, query: str) -> int:
+    @staticmethod
+    def _max_label_length(query: str) -> int:
         """Get maximum length of any label in the domain."""
         labels = query.split('.')
         return max(len(label) for label in labels) if labels else 0
     
-    def _digits_ratio(self, query: str) -> float:
+    @staticmethod
+    def _digits_ratio(query: str) -> float:
         """Calculate ratio of digits to total characters."""
         if not query:
             return 0.0
         digit_count = sum(1 for char in query if char.isdigit())
         return digit_count / len(query)
     
-    def _non_alphanumeric_ratio(self, query: str) -> float:
+    @staticmethod
+    def _non_alphanumeric_ratio(query: str) -> float:
         """Calculate ratio of non-alphanumeric characters (excluding dots)."""
         if not query:
             return 0.0
@@ -182,20 +259,55 @@ class FeatureExtractor:
         Returns:
             DataFrame with features
         """
-        features_list = []
+        return self.extract_column_features(
+            [q['query'] for q in queries],
+            [q['client_ip'] for q in queries],
+            [q.get('timestamp') for q in queries]
+        )
+    
+    def extract_column_features(self, queries: Sequence[str], client_ips: Sequence[str],
+                                timestamps: Optional[Sequence[Optional[datetime]]] = None) -> pd.DataFrame:
+        """
+        Extract features from parallel query/client columns (e.g. DataFrame columns).
+        
+        Args:
+            queries: DNS query strings
+            client_ips: Source IP address for each query
+            timestamps: Query timestamps (None entries default to now)
+            
+        Returns:
+            DataFrame with features
+        """
+        if timestamps is None:
+            timestamps = [None] * len(queries)
+        
+        # Per-query features are computed once per distinct query string and
+        # gathered back to rows; window features depend on each row's client
+        # and time, so they are still computed in order
+        rows, distinct = pd.factorize(np.asarray(queries, dtype=object))
+        columns = {
+            name: values[rows]
+            for name, values in self._batch_query_features(distinct.tolist()).items()
+        }
+        
+        resolved_timestamps = []
+        window_rows = []
+        for query, client_ip, timestamp, entropy in zip(
+            queries, client_ips, timestamps, columns['entropy'].tolist()
+        ):
+            if timestamp is None:
+                timestamp = datetime.utcnow()
+            resolved_timestamps.append(timestamp)
+            window_rows.append(self._update_window(query, entropy, client_ip, timestamp))
+        
+        for name in ('qps', 'unique_subdomains', 'avg_entropy', 'max_entropy'):
+            columns[name] = [window[name] for window in window_rows]
         
-        for q in queries:
-            features = self.extract_features(
-                query=q['query'],
-                client_ip=q['client_ip'],
-                timestamp=q.get('timestamp')
-            )
-            features['query'] = q['query']
-            features['client_ip'] = q['client_ip']
-            features['timestamp'] = q.get('timestamp', datetime.utcnow())
-            features_list.append(features)
+        columns['query'] = list(queries)
+        columns['client_ip'] = list(client_ips)
+        columns['timestamp'] = resolved_timestamps
         
-        return pd.DataFrame(features_list)
+        return pd.DataFrame(columns)
     
     def get_feature_names(self) -> List[str]:
         """Get list of feature names used by the model."""
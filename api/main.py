@@ -654,8 +654,6 @@ async def handle_alert(
     timestamp: datetime
 ):
     """Handle alert generation and notification."""
-    from api.database import get_db_context
-    
     # Prepare alert data
     alert_data = {
         'severity': severity,
@@ -666,28 +664,41 @@ async def handle_alert(
         'features': features
     }
     
+    await record_alert(alert_data, app.state.alerting_agent, app.state.response_agent)
+
+
+async def record_alert(alert_data: dict, alerting_agent: AlertingAgent, response_agent: ResponseAgent):
+    """
+    Send an alert, store it and run the response agent on it.
+    
+    Shared by the API's background tasks and the service's log collector,
+    which hold their own agent instances.
+    """
+    from api.database import get_db_context
+    
     # Send alerts
-    alert_results = await app.state.alerting_agent.send_alert(alert_data)
+    alert_results = await alerting_agent.send_alert(alert_data)
     
     # Store alert in database
     with get_db_context() as db:
         db_alert = Alert(
-            timestamp=timestamp,
-            severity=severity,
-            anomaly_score=anomaly_score,
-            domain=domain,
-            client_ip=client_ip,
+            timestamp=alert_data['timestamp'],
+            severity=alert_data['severity'],
+            anomaly_score=alert_data['anomaly_score'],
+            domain=alert_data['domain'],
+            client_ip=alert_data['client_ip'],
             slack_sent=alert_results.get('slack', False),
             email_sent=alert_results.get('email', False),
             jira_ticket=alert_results.get('jira_ticket'),
-            alert_data=alert_data
+            # JSON column; the agents still get the datetime
+            alert_data={**alert_data, 'timestamp': alert_data['timestamp'].isoformat()}
         )
         db.add(db_alert)
         db.commit()
         db.refresh(db_alert)
         
         # Trigger response agent
-        response = await app.state.response_agent.handle_alert(alert_data)
+        response = await response_agent.handle_alert(alert_data)
         
         # Update alert with response info
         db_alert.action_taken = response.get('action')
@@ -3,20 +3,24 @@ Automated Weekly Model Retraining
 Collects normal traffic from the past 7 days and retrains the model
 """
 
+import asyncio
 import os
 import sys
 from pathlib import Path
 from datetime import datetime, timedelta
+from functools import lru_cache
 import pandas as pd
 from loguru import logger
 import json
+import httpx
+from jinja2 import Environment, FileSystemLoader
+from sqlalchemy import create_engine, text
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from agents.feature_extractor import FeatureExtractor
 from agents.scorer import AnomalyScorer
-from agents.alerting import AlertingAgent
 
 # Configuration
 MODEL_DIR = Path("/app/models")
@@ -24,6 +28,17 @@ MODEL_PATH = MODEL_DIR / "isolation_forest.pkl"
 BACKUP_DIR = MODEL_DIR / "backups"
 REPORT_PATH = Path("/app/reports") / "training_reports"
 DB_CONNECTION = os.getenv('DATABASE_URL')
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+REPORT_STYLESHEET = "training_report.css"
+REPORT_RETENTION = 8  # Keep the last 8 weekly reports
+
+# Compiled once at import; auto_reload is off since templates ship with the code
+_template_env = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_DIR)),
+    autoescape=True,
+    auto_reload=False,
+)
+_report_template = _template_env.get_template("training_report.html.j2")
 
 
 def backup_current_model():
@@ -40,37 +55,46 @@ def backup_current_model():
     return None
 
 
+# Plan-cached statement; the DISTINCT/filter query is identical every run
+TRAINING_DATA_QUERY = text("""
+    SELECT DISTINCT query, client_ip
+    FROM dns_queries
+    WHERE severity = 'NORMAL'
+    AND timestamp >= :cutoff
+    AND anomaly_score < 0.5
+    LIMIT 10000
+""")
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Get the pooled database engine (created on first use)"""
+    return create_engine(
+        DB_CONNECTION,
+        pool_pre_ping=True,
+        pool_size=2,
+        max_overflow=2,
+        pool_recycle=3600
+    )
+
+
 def collect_training_data(days=7):
     """Collect NORMAL severity queries from the database"""
-    try:
-        import psycopg2
-
-        conn = psycopg2.connect(DB_CONNECTION)
-        cursor = conn.cursor()
+    if not DB_CONNECTION:
+        logger.warning("DATABASE_URL not set, skipping database collection")
+        return None
 
+    try:
         # Get queries from the past 7 days that were marked as NORMAL
         cutoff_date = datetime.now() - timedelta(days=days)
 
-        query = """
-            SELECT DISTINCT query, source_ip
-            FROM dns_queries
-            WHERE severity = 'NORMAL'
-            AND timestamp >= %s
-            AND anomaly_score < 0.5
-            LIMIT 10000
-        """
-
-        cursor.execute(query, (cutoff_date,))
-        results = cursor.fetchall()
+        with get_engine().connect() as conn:
+            df = pd.read_sql(TRAINING_DATA_QUERY, conn, params={'cutoff': cutoff_date})
 
-        cursor.close()
-        conn.close()
-
-        if not results:
+        if df.empty:
             logger.warning("No NORMAL queries found in database, using sample data")
             return None
 
-        df = pd.DataFrame(results, columns=['query', 'client_ip'])
         logger.info(f"Collected {len(df)} NORMAL queries from past {days} days")
 
         return df
@@ -80,11 +104,20 @@ def collect_training_data(days=7):
         return None
 
 
+@lru_cache(maxsize=4)
+def _sample_training_records(num_samples, seed):
+    """Generate sample records as a hashable tuple so repeat calls are cached"""
+    from scripts.train_model import generate_sample_data
+    df = generate_sample_data(num_samples, seed=seed)
+    return tuple(df.itertuples(index=False, name=None)), tuple(df.columns)
+
+
 def generate_sample_training_data(num_samples=5000):
     """Fallback: Generate sample training data"""
-    from scripts.train_model import generate_sample_data
     logger.info("Using sample data for training")
-    return generate_sample_data(num_samples)
+    seed = int(os.environ.get('SAMPLE_SEED', '42'))
+    records, columns = _sample_training_records(num_samples, seed)
+    return pd.DataFrame(list(records), columns=list(columns))
 
 
 def train_new_model(training_data):
@@ -93,24 +126,27 @@ def train_new_model(training_data):
 
     # Extract features
     extractor = FeatureExtractor(window_size=60)
-    queries = training_data.to_dict('records')
-    features_df = extractor.extract_batch_features(queries)
+    features_df = extractor.extract_column_features(
+        training_data['query'].to_numpy(dtype=object),
+        training_data['client_ip'].to_numpy(dtype=object)
+    )
 
-    # Train model
+    # Train model and evaluate on training data in the same pass
     scorer = AnomalyScorer()
-    scorer.train(features_df)
+    features_df = scorer.fit_score(features_df)
 
-    # Evaluate on training data
-    features_df = scorer.score_batch(features_df)
+    # One pass per column instead of one scan per statistic
+    score_stats = features_df['anomaly_score'].agg(['mean', 'std', 'max'])
+    severity_pct = features_df['severity'].value_counts(normalize=True) * 100
 
     stats = {
         'training_samples': len(features_df),
-        'mean_score': float(features_df['anomaly_score'].mean()),
-        'std_score': float(features_df['anomaly_score'].std()),
-        'max_score': float(features_df['anomaly_score'].max()),
-        'normal_pct': float((features_df['severity'] == 'NORMAL').sum() / len(features_df) * 100),
-        'suspicious_pct': float((features_df['severity'] == 'SUSPICIOUS').sum() / len(features_df) * 100),
-        'high_pct': float((features_df['severity'] == 'HIGH').sum() / len(features_df) * 100),
+        'mean_score': float(score_stats['mean']),
+        'std_score': float(score_stats['std']),
+        'max_score': float(score_stats['max']),
+        'normal_pct': float(severity_pct.get('NORMAL', 0.0)),
+        'suspicious_pct': float(severity_pct.get('SUSPICIOUS', 0.0)),
+        'high_pct': float(severity_pct.get('HIGH', 0.0)),
     }
 
     logger.info(f"Training stats: {stats}")
@@ -148,221 +184,60 @@ def validate_model(scorer):
     return results
 
 
+def get_report_path(timestamp):
+    """Get the HTML report path for a training run"""
+    return REPORT_PATH / f"training_report_{timestamp}.html"
+
+
+def install_report_stylesheet():
+    """Copy the shared report stylesheet next to the reports if missing"""
+    stylesheet = REPORT_PATH / REPORT_STYLESHEET
+    if not stylesheet.exists():
+        import shutil
+        shutil.copy(TEMPLATE_DIR / REPORT_STYLESHEET, stylesheet)
+        logger.info(f"Installed report stylesheet at {stylesheet}")
+
+
+def cleanup_old_reports(keep=REPORT_RETENTION):
+    """Delete all but the most recent training reports"""
+    reports = sorted(REPORT_PATH.glob("training_report_*.html"))
+    for old_report in reports[:-keep]:
+        old_report.unlink()
+        logger.info(f"Removed old training report: {old_report}")
+
+
 def generate_training_report(backup_path, stats, validation_results, timestamp):
     """Generate HTML training report"""
     REPORT_PATH.mkdir(parents=True, exist_ok=True)
+    install_report_stylesheet()
 
-    report_file = REPORT_PATH / f"training_report_{timestamp}.html"
+    report_file = get_report_path(timestamp)
 
     passed_tests = sum(1 for r in validation_results if r['passed'])
     total_tests = len(validation_results)
 
-    html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Model Training Report - {timestamp}</title>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                max-width: 1200px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #f5f5f5;
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px;
-                border-radius: 10px;
-                margin-bottom: 30px;
-            }}
-            .section {{
-                background: white;
-                padding: 25px;
-                border-radius: 10px;
-                margin-bottom: 20px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }}
-            .metric {{
-                display: inline-block;
-                padding: 15px 25px;
-                margin: 10px;
-                background: #f0f2f6;
-                border-radius: 8px;
-                border-left: 4px solid #667eea;
-            }}
-            .metric-value {{
-                font-size: 2rem;
-                font-weight: bold;
-                color: #667eea;
-            }}
-            .metric-label {{
-                color: #666;
-                font-size: 0.9rem;
-            }}
-            table {{
-                width: 100%;
-                border-collapse: collapse;
-                margin-top: 15px;
-            }}
-            th, td {{
-                padding: 12px;
-                text-align: left;
-                border-bottom: 1px solid #ddd;
-            }}
-            th {{
-                background-color: #667eea;
-                color: white;
-            }}
-            .pass {{
-                color: #4caf50;
-                font-weight: bold;
-            }}
-            .fail {{
-                color: #f44336;
-                font-weight: bold;
-            }}
-            .warning {{
-                background-color: #fff3e0;
-                border-left: 4px solid #ff9800;
-                padding: 15px;
-                margin: 15px 0;
-                border-radius: 5px;
-            }}
-            .success {{
-                background-color: #e8f5e9;
-                border-left: 4px solid #4caf50;
-                padding: 15px;
-                margin: 15px 0;
-                border-radius: 5px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>🤖 Automated Model Training Report</h1>
-            <p>Training Date: {datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC")}</p>
-            <p>Model Version: {timestamp}</p>
-        </div>
-
-        <div class="section">
-            <h2>📊 Training Statistics</h2>
-            <div>
-                <div class="metric">
-                    <div class="metric-value">{stats['training_samples']:,}</div>
-                    <div class="metric-label">Training Samples</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-value">{stats['normal_pct']:.1f}%</div>
-                    <div class="metric-label">Normal</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-value">{stats['suspicious_pct']:.1f}%</div>
-                    <div class="metric-label">Suspicious</div>
-                </div>
-                <div class="metric">
-                    <div class="metric-value">{stats['high_pct']:.1f}%</div>
-                    <div class="metric-label">High Risk</div>
-                </div>
-            </div>
-        </div>
-
-        <div class="section">
-            <h2>✅ Validation Results</h2>
-            <p><strong>Tests Passed: {passed_tests}/{total_tests}</strong></p>
-
-            <table>
-                <tr>
-                    <th>Query</th>
-                    <th>Score</th>
-                    <th>Severity</th>
-                    <th>Expected</th>
-                    <th>Result</th>
-                </tr>
-    """
+    _report_template.stream(
+        stats=stats,
+        results=validation_results,
+        passed_tests=passed_tests,
+        total_tests=total_tests,
+        timestamp=timestamp,
+        generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S UTC"),
+        backup=backup_path,
+    ).dump(str(report_file), encoding='utf-8')
 
-    for result in validation_results:
-        status_class = "pass" if result['passed'] else "fail"
-        status_text = "✓ PASS" if result['passed'] else "✗ FAIL"
-        html += f"""
-                <tr>
-                    <td><code>{result['query'][:60]}</code></td>
-                    <td>{result['score']:.4f}</td>
-                    <td>{result['severity']}</td>
-                    <td>{result['expected']}</td>
-                    <td class="{status_class}">{status_text}</td>
-                </tr>
-        """
-
-    html += """
-            </table>
-        </div>
-
-        <div class="section">
-            <h2>📋 Next Steps</h2>
-    """
-
-    if passed_tests == total_tests:
-        html += """
-            <div class="success">
-                <strong>✓ All validation tests passed!</strong><br>
-                The new model is performing as expected and is ready for deployment.
-            </div>
-            <h3>Recommended Actions:</h3>
-            <ol>
-                <li>✅ Review the training statistics above</li>
-                <li>✅ Deploy the new model to production</li>
-                <li>✅ Monitor performance for the next 24 hours</li>
-                <li>Archive old model backups (keep last 4 weeks)</li>
-            </ol>
-        """
-    else:
-        html += f"""
-            <div class="warning">
-                <strong>⚠ Warning: {total_tests - passed_tests} validation test(s) failed!</strong><br>
-                The new model may not be performing correctly. Human review required before deployment.
-            </div>
-            <h3>Recommended Actions:</h3>
-            <ol>
-                <li>🔍 Review failed test cases above</li>
-                <li>🔍 Check if training data quality is sufficient</li>
-                <li>❌ DO NOT deploy until issues are resolved</li>
-                <li>Consider restoring backup model: <code>{backup_path.name if backup_path else 'N/A'}</code></li>
-                <li>Investigate why the model is misclassifying queries</li>
-            </ol>
-        """
-
-    html += """
-        </div>
-
-        <div class="section">
-            <h2>📁 Model Information</h2>
-            <ul>
-                <li><strong>Model Location:</strong> <code>/app/models/isolation_forest.pkl</code></li>
-                <li><strong>Backup Location:</strong> <code>/app/models/backups/</code></li>
-                <li><strong>Algorithm:</strong> Isolation Forest</li>
-                <li><strong>Features:</strong> 10 (length, entropy, labels, digits, etc.)</li>
-            </ul>
-        </div>
-    </body>
-    </html>
-    """
+    logger.info(f"Training report saved to: {report_file}")
 
-    with open(report_file, 'w') as f:
-        f.write(html)
+    cleanup_old_reports()
 
-    logger.info(f"Training report saved to: {report_file}")
     return report_file
 
 
-def send_notification(report_path, stats, validation_results):
+async def send_notification(report_path, stats, validation_results):
     """Send notification to admins for human review"""
     passed_tests = sum(1 for r in validation_results if r['passed'])
     total_tests = len(validation_results)
 
-    alerting = AlertingAgent()
-
     message = f"""
 🤖 **Automated Model Retraining Complete**
 
@@ -380,17 +255,23 @@ def send_notification(report_path, stats, validation_results):
     """
 
     # Send to configured channels
-    if os.getenv('SLACK_WEBHOOK_URL'):
+    slack_webhook_url = os.getenv('SLACK_WEBHOOK_URL')
+    if slack_webhook_url:
         try:
-            import asyncio
-            asyncio.run(alerting.send_slack_alert('system-admin', 'N/A', 0.0, 'NORMAL', {}))
-        except:
-            pass
+            async with httpx.AsyncClient() as client:
+                response = await client.post(
+                    slack_webhook_url,
+                    json={'text': message},
+                    timeout=10.0
+                )
+                response.raise_for_status()
+        except Exception as e:
+            logger.error(f"Failed to send Slack notification: {e}")
 
     logger.info("Notifications sent to configured channels")
 
 
-def main():
+async def main():
     """Main retraining function"""
     logger.info("=" * 80)
     logger.info("Starting Automated Weekly Model Retraining")
@@ -415,11 +296,12 @@ def main():
         # Step 4: Validate new model
         validation_results = validate_model(scorer)
 
-        # Step 5: Generate report
-        report_path = generate_training_report(backup_path, stats, validation_results, timestamp)
-
-        # Step 6: Send notifications
-        send_notification(report_path, stats, validation_results)
+        # Step 5 + 6: Write report and send notifications concurrently
+        report_path = get_report_path(timestamp)
+        await asyncio.gather(
+            asyncio.to_thread(generate_training_report, backup_path, stats, validation_results, timestamp),
+            send_notification(report_path, stats, validation_results)
+        )
 
         # Step 7: Save new model if validation passed
         passed_tests = sum(1 for r in validation_results if r['passed'])
@@ -442,4 +324,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -4,11 +4,23 @@ Includes both benign and malicious (tunneling) traffic.
 """
 
 import argparse
-import random
+import base64
+import heapq
+import os
 import json
+from operator import itemgetter
 from datetime import datetime, timedelta
 from pathlib import Path
 
+import numpy as np
+
+# Lowercase alphanumeric alphabet as single-byte array for vectorized lookup
+ALNUM_CHARS = np.frombuffer(b'0123456789abcdefghijklmnopqrstuvwxyz', dtype='S1')
+
+# Shared PCG64 generator; set LOG_SEED for reproducible logs
+_log_seed = os.getenv('LOG_SEED')
+rng = np.random.default_rng(np.random.SeedSequence(int(_log_seed) if _log_seed else None))
+
 
 def generate_benign_queries(num_queries: int) -> list:
     """Generate benign DNS queries."""
@@ -37,12 +49,15 @@ def generate_benign_queries(num_queries: int) -> list:
     
     queries = []
     start_time = datetime.utcnow() - timedelta(hours=1)
+
+    domain_idx = rng.integers(0, len(domains), size=num_queries)
+    hosts = rng.integers(10, 201, size=num_queries)
     
     for i in range(num_queries):
         query = {
             'timestamp': (start_time + timedelta(seconds=i*3.6)).isoformat(),
-            'query': random.choice(domains),
-            'client_ip': f"192.168.1.{random.randint(10, 200)}",
+            'query': domains[domain_idx[i]],
+            'client_ip': f"192.168.1.{hosts[i]}",
             'qtype': 'A'
         }
         queries.append(query)
@@ -57,23 +72,26 @@ def generate_tunneling_queries(num_queries: int, tunnel_type: str = 'dnscat2') -
     
     # Base domains for tunneling
     base_domains = ["evil.com", "malicious.net", "c2server.org"]
-    base_domain = random.choice(base_domains)
+    base_domain = base_domains[rng.integers(0, len(base_domains))]
+
+    hosts = rng.integers(50, 61, size=num_queries)
+    is_txt = rng.random(num_queries) < 0.3
     
     for i in range(num_queries):
         if tunnel_type == 'dnscat2':
             # dnscat2 uses encoded subdomains with session IDs
-            session_id = f"{random.randint(1000, 9999):04x}"
-            data = ''.join(random.choices('0123456789abcdef', k=32))
+            session_id = f"{rng.integers(0, 1 << 16):04x}"
+            data = rng.bytes(16).hex()
             subdomain = f"{session_id}.{data}.{base_domain}"
             
         elif tunnel_type == 'iodine':
-            # iodine uses base32 encoding with prefix
-            data = ''.join(random.choices('abcdefghijklmnopqrstuvwxyz234567', k=24))
+            # iodine uses base32 encoding with prefix (15 bytes -> 24 chars, no padding)
+            data = base64.b32encode(rng.bytes(15)).decode('ascii').lower()
             subdomain = f"t{data}.{base_domain}"
             
         elif tunnel_type == 'custom':
             # Custom exfiltration with high entropy
-            data = ''.join(random.choices('0123456789abcdefghijklmnopqrstuvwxyz', k=40))
+            data = ALNUM_CHARS[rng.integers(0, len(ALNUM_CHARS), size=40)].tobytes().decode('ascii')
             subdomain = f"{data}.{base_domain}"
             
         else:
@@ -82,8 +100,8 @@ def generate_tunneling_queries(num_queries: int, tunnel_type: str = 'dnscat2') -
         query = {
             'timestamp': (start_time + timedelta(seconds=i*2)).isoformat(),
             'query': subdomain,
-            'client_ip': f"10.0.1.{random.randint(50, 60)}",  # Different subnet for malicious
-            'qtype': 'TXT' if random.random() < 0.3 else 'A'
+            'client_ip': f"10.0.1.{hosts[i]}",  # Different subnet for malicious
+            'qtype': 'TXT' if is_txt[i] else 'A'
         }
         queries.append(query)
     
@@ -110,17 +128,24 @@ def save_as_zeek(queries: list, output_path: str):
         f.write("#separator \\x09\n")
         f.write("#fields\tts\tuid\tid.orig_h\tid.orig_p\tid.resp_h\tid.resp_p\tproto\ttrans_id\trtt\tquery\tqclass\tqclass_name\tqtype\tqtype_name\trcode\trcode_name\tAA\tTC\tRD\tRA\tZ\tanswers\tTTLs\trejected\n")
         
+        # Draw per-record random fields in bulk
+        n = len(queries)
+        uids = rng.integers(10000, 100000, size=n)
+        orig_ports = rng.integers(50000, 60001, size=n)
+        trans_ids = rng.integers(1000, 10000, size=n)
+        rtts = rng.uniform(0.01, 0.1, size=n)
+
         # Write queries
-        for query in queries:
+        for i, query in enumerate(queries):
             ts = datetime.fromisoformat(query['timestamp'].replace('Z', '')).timestamp()
-            uid = f"C{random.randint(10000, 99999)}"
+            uid = f"C{uids[i]}"
             orig_h = query['client_ip']
-            orig_p = random.randint(50000, 60000)
+            orig_p = orig_ports[i]
             resp_h = "8.8.8.8"
             resp_p = 53
             proto = "udp"
-            trans_id = random.randint(1000, 9999)
-            rtt = f"{random.uniform(0.01, 0.1):.3f}"
+            trans_id = trans_ids[i]
+            rtt = f"{rtts[i]:.3f}"
             qname = query['query']
             qclass = "1"
             qclass_name = "C_INTERNET"
@@ -179,12 +204,9 @@ def main():
     print(f"Generating {args.malicious} malicious queries ({args.tunnel_type})...")
     malicious = generate_tunneling_queries(args.malicious, args.tunnel_type)
     
-    # Combine and shuffle
-    all_queries = benign + malicious
-    random.shuffle(all_queries)
-    
-    # Sort by timestamp
-    all_queries.sort(key=lambda x: x['timestamp'])
+    # Both generators emit queries in timestamp order, so a linear merge
+    # yields the combined timeline without a shuffle + full sort
+    all_queries = list(heapq.merge(benign, malicious, key=itemgetter('timestamp')))
     
     # Save
     if args.format == 'json':
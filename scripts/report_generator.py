@@ -4,25 +4,32 @@ Creates PDF reports for DNS tunneling detection incidents.
 """
 
 import argparse
+import hashlib
 import sys
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict
 import io
 
+import reportlab
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image as RLImage
+    PageBreak
 )
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.graphics.charts.lineplots import LinePlot
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.textlabels import Label
+from reportlab.graphics.widgets.markers import makeMarker
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from sqlalchemy import case, distinct, func
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -30,6 +37,125 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from api.database import get_db_context
 from api.models import Alert, DNSQuery
 
+# Number of highest-scoring alerts listed in the details table
+MAX_DETAIL_ROWS = 20
+
+# Timeline marker colors (semi-transparent so overlapping alerts stay visible)
+SEVERITY_COLORS = {
+    'HIGH': colors.Color(1, 0, 0, alpha=0.6),
+    'SUSPICIOUS': colors.Color(1, 0.65, 0, alpha=0.6)
+}
+
+RECOMMENDATIONS_TEXT = """
+        <b>Immediate Actions (0-24 hours):</b><br/>
+        1. Isolate affected systems from the network<br/>
+        2. Block identified malicious domains at DNS and firewall level<br/>
+        3. Collect forensic evidence from affected hosts<br/>
+        4. Run antimalware scans on compromised systems<br/>
+        5. Review authentication logs for lateral movement<br/><br/>
+        
+        <b>Short-term Actions (1-7 days):</b><br/>
+        1. Conduct full incident investigation<br/>
+        2. Identify root cause and initial infection vector<br/>
+        3. Reimagine compromised systems if necessary<br/>
+        4. Update detection rules based on findings<br/>
+        5. Brief stakeholders on incident status<br/><br/>
+        
+        <b>Long-term Actions (1-3 months):</b><br/>
+        1. Implement additional DNS monitoring controls<br/>
+        2. Deploy DNS filtering/sinkholing solutions<br/>
+        3. Conduct security awareness training<br/>
+        4. Review and update incident response procedures<br/>
+        5. Consider network segmentation improvements<br/>
+        """
+
+
+def create_document(target) -> SimpleDocTemplate:
+    """Create a letter-size PDF document with the report margins."""
+    return SimpleDocTemplate(
+        target,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=18
+    )
+
+
+def create_report_styles():
+    """Create the sample stylesheet plus the report's custom paragraph styles."""
+    styles = getSampleStyleSheet()
+    
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#CC0000'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+    
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#333333'),
+        spaceAfter=12,
+        spaceBefore=12
+    ))
+    
+    return styles
+
+
+def build_recommendations_pdf() -> bytes:
+    """Render the static incident response recommendations pages."""
+    styles = create_report_styles()
+    buffer = io.BytesIO()
+    create_document(buffer).build([
+        Paragraph("Incident Response Recommendations", styles['SectionHeader']),
+        Paragraph(RECOMMENDATIONS_TEXT, styles['Normal'])
+    ])
+    return buffer.getvalue()
+
+
+def get_boilerplate_digest() -> str:
+    """Hash everything that shapes the recommendations pages."""
+    styles = create_report_styles()
+    doc = create_document(io.BytesIO())
+    layout = [
+        doc.pagesize, doc.leftMargin, doc.rightMargin, doc.topMargin, doc.bottomMargin
+    ] + [
+        sorted((key, repr(value)) for key, value in vars(styles[name]).items() if key != 'parent')
+        for name in ('SectionHeader', 'Normal')
+    ]
+    return hashlib.sha1(
+        repr((RECOMMENDATIONS_TEXT, layout, reportlab.Version)).encode('utf-8')
+    ).hexdigest()[:12]
+
+
+@lru_cache(maxsize=1)
+def get_boilerplate_pdf(cache_dir: str) -> bytes:
+    """
+    Get the static report pages, rendering them at most once.
+    
+    The rendered PDF is cached in memory and on disk under cache_dir, keyed
+    by a hash of the text, page layout, paragraph styles and ReportLab
+    version, so a change to any of them renders a fresh copy.
+    """
+    digest = get_boilerplate_digest()
+    cache_file = Path(cache_dir) / f".boilerplate-{digest}.pdf"
+    
+    if cache_file.exists():
+        return cache_file.read_bytes()
+    
+    # Copies rendered under an older layout are never read again
+    for stale in Path(cache_dir).glob(".boilerplate-*.pdf"):
+        stale.unlink(missing_ok=True)
+    
+    pdf_bytes = build_recommendations_pdf()
+    cache_file.write_bytes(pdf_bytes)
+    return pdf_bytes
+
 
 class IncidentReportGenerator:
     """Generates PDF incident reports for DNS tunneling detections."""
@@ -40,42 +166,9 @@ class IncidentReportGenerator:
             output_path: Path to save the PDF report
         """
         self.output_path = output_path
-        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
-        
-        # Create PDF document
-        self.doc = SimpleDocTemplate(
-            output_path,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=18
-        )
-        
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
+        self.styles = create_report_styles()
         self.story = []
     
-    def _create_custom_styles(self):
-        """Create custom paragraph styles."""
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#CC0000'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12,
-            spaceBefore=12
-        ))
-    
     def add_title_page(self, alert_count: int, severity: str):
         """Add title page to report."""
         # Title
@@ -146,62 +239,104 @@ class IncidentReportGenerator:
         self.story.append(summary_para)
         self.story.append(Spacer(1, 0.3*inch))
     
-    def add_alert_timeline_chart(self, alerts: List[Alert]):
-        """Add alert timeline visualization."""
+    def add_alert_timeline_chart(self, columns: Dict[str, np.ndarray]):
+        """
+        Add alert timeline visualization.
+        
+        Args:
+            columns: Parallel 'timestamp', 'severity' and 'score' arrays
+        """
         header = Paragraph("Alert Timeline", self.styles['SectionHeader'])
         self.story.append(header)
         
         # Create timeline chart
-        df = pd.DataFrame([
-            {'timestamp': a.timestamp, 'severity': a.severity, 'score': a.anomaly_score}
-            for a in alerts
-        ])
+        df = pd.DataFrame(columns)
         
         if len(df) > 0:
-            fig, ax = plt.subplots(figsize=(8, 4))
+            # Plot by severity; x values are seconds since the first alert
+            start = df['timestamp'].min()
+            df['offset'] = (df['timestamp'] - start).dt.total_seconds()
+            series = [
+                (severity, list(zip(subset['offset'], subset['score'])))
+                for severity, subset in df.groupby('severity')
+                if severity in SEVERITY_COLORS
+            ]
+            if not series:
+                return
+            
+            # Draw the chart as vector graphics directly in the PDF
+            width, height = 6*inch, 3*inch
+            drawing = Drawing(width, height)
+            
+            plot = LinePlot()
+            plot.x, plot.y = 50, 55
+            plot.width, plot.height = width - 140, height - 85
+            plot.joinedLines = 0
+            plot.data = [points for _, points in series]
+            for i, (severity, _) in enumerate(series):
+                color = SEVERITY_COLORS[severity]
+                plot.lines[i].strokeColor = color
+                plot.lines[i].symbol = makeMarker('FilledCircle', size=7, fillColor=color, strokeColor=color)
             
-            # Plot by severity
-            for severity, color in [('HIGH', 'red'), ('SUSPICIOUS', 'orange')]:
-                subset = df[df['severity'] == severity]
-                if len(subset) > 0:
-                    ax.scatter(subset['timestamp'], subset['score'], 
-                             c=color, label=severity, alpha=0.6, s=100)
+            plot.xValueAxis.labelTextFormat = lambda seconds: (
+                start + timedelta(seconds=seconds)
+            ).strftime('%m-%d %H:%M')
+            plot.xValueAxis.labels.angle = 45
+            plot.xValueAxis.labels.boxAnchor = 'ne'
+            plot.yValueAxis.valueMin = 0
+            plot.yValueAxis.valueMax = 1
+            for axis in (plot.xValueAxis, plot.yValueAxis):
+                axis.labels.fontName = 'Helvetica'
+                axis.labels.fontSize = 7
+                axis.visibleGrid = 1
+                axis.gridStrokeColor = colors.lightgrey
+            drawing.add(plot)
             
-            ax.set_xlabel('Time')
-            ax.set_ylabel('Anomaly Score')
-            ax.set_title('DNS Tunneling Detection Timeline')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            plt.xticks(rotation=45)
-            plt.tight_layout()
+            legend = Legend()
+            legend.x, legend.y = width - 75, height - 30
+            legend.fontName = 'Helvetica'
+            legend.fontSize = 7
+            legend.alignment = 'right'
+            legend.colorNamePairs = [(SEVERITY_COLORS[severity], severity) for severity, _ in series]
+            drawing.add(legend)
             
-            # Save to buffer
-            img_buffer = io.BytesIO()
-            plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-            img_buffer.seek(0)
-            plt.close()
+            drawing.add(String(width / 2, height - 12, 'DNS Tunneling Detection Timeline',
+                               textAnchor='middle', fontName='Helvetica', fontSize=10))
+            drawing.add(String(plot.x + plot.width / 2, 2, 'Time',
+                               textAnchor='middle', fontName='Helvetica', fontSize=8))
+            y_label = Label()
+            y_label.setOrigin(15, plot.y + plot.height / 2)
+            y_label.angle = 90
+            y_label.fontName = 'Helvetica'
+            y_label.fontSize = 8
+            y_label.setText('Anomaly Score')
+            drawing.add(y_label)
             
-            # Add to PDF
-            img = RLImage(img_buffer, width=6*inch, height=3*inch)
-            self.story.append(img)
+            self.story.append(drawing)
             self.story.append(Spacer(1, 0.3*inch))
     
-    def add_alert_details_table(self, alerts: List[Alert]):
-        """Add detailed alert information table."""
+    def add_alert_details_table(self, alerts: List[Dict]):
+        """
+        Add detailed alert information table.
+        
+        Args:
+            alerts: Dicts with timestamp, domain, client_ip, anomaly_score
+                and severity keys, highest score first
+        """
         header = Paragraph("Alert Details", self.styles['SectionHeader'])
         self.story.append(header)
         
-        # Prepare table data
-        table_data = [['Timestamp', 'Domain', 'Client IP', 'Score', 'Severity']]
+        # Prepare table data with column-wise formatting
+        df = pd.DataFrame.from_records(
+            alerts[:MAX_DETAIL_ROWS],
+            columns=['timestamp', 'domain', 'client_ip', 'anomaly_score', 'severity']
+        )
+        if len(df) > 0:
+            df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M')
+            df['domain'] = df['domain'].str.slice(0, 40)  # Truncate long domains
+            df['anomaly_score'] = df['anomaly_score'].map('{:.3f}'.format)
         
-        for alert in alerts[:20]:  # Limit to top 20
-            table_data.append([
-                alert.timestamp.strftime('%Y-%m-%d %H:%M'),
-                alert.domain[:40],  # Truncate long domains
-                alert.client_ip,
-                f"{alert.anomaly_score:.3f}",
-                alert.severity
-            ])
+        table_data = [['Timestamp', 'Domain', 'Client IP', 'Score', 'Severity']] + df.values.tolist()
         
         # Create table
         table = Table(table_data, colWidths=[1.3*inch, 2.2*inch, 1.2*inch, 0.7*inch, 1*inch])
@@ -220,15 +355,11 @@ class IncidentReportGenerator:
         self.story.append(table)
         self.story.append(Spacer(1, 0.3*inch))
     
-    def add_technical_analysis(self, alerts: List[Alert]):
+    def add_technical_analysis(self, avg_entropy: float, avg_length: float):
         """Add technical analysis section."""
         header = Paragraph("Technical Analysis", self.styles['SectionHeader'])
         self.story.append(header)
         
-        # Calculate statistics
-        avg_entropy = sum(a.alert_data.get('features', {}).get('entropy', 0) for a in alerts) / len(alerts) if alerts else 0
-        avg_length = sum(a.alert_data.get('features', {}).get('len_q', 0) for a in alerts) / len(alerts) if alerts else 0
-        
         analysis_text = f"""
         <b>Behavioral Analysis:</b><br/>
         The detected queries exhibit characteristics consistent with DNS tunneling:<br/><br/>
@@ -251,37 +382,6 @@ class IncidentReportGenerator:
         self.story.append(analysis_para)
         self.story.append(Spacer(1, 0.3*inch))
     
-    def add_recommendations(self):
-        """Add recommendations section."""
-        header = Paragraph("Incident Response Recommendations", self.styles['SectionHeader'])
-        self.story.append(header)
-        
-        recommendations = """
-        <b>Immediate Actions (0-24 hours):</b><br/>
-        1. Isolate affected systems from the network<br/>
-        2. Block identified malicious domains at DNS and firewall level<br/>
-        3. Collect forensic evidence from affected hosts<br/>
-        4. Run antimalware scans on compromised systems<br/>
-        5. Review authentication logs for lateral movement<br/><br/>
-        
-        <b>Short-term Actions (1-7 days):</b><br/>
-        1. Conduct full incident investigation<br/>
-        2. Identify root cause and initial infection vector<br/>
-        3. Reimagine compromised systems if necessary<br/>
-        4. Update detection rules based on findings<br/>
-        5. Brief stakeholders on incident status<br/><br/>
-        
-        <b>Long-term Actions (1-3 months):</b><br/>
-        1. Implement additional DNS monitoring controls<br/>
-        2. Deploy DNS filtering/sinkholing solutions<br/>
-        3. Conduct security awareness training<br/>
-        4. Review and update incident response procedures<br/>
-        5. Consider network segmentation improvements<br/>
-        """
-        
-        rec_para = Paragraph(recommendations, self.styles['Normal'])
-        self.story.append(rec_para)
-    
     def generate(self, hours: int = 24):
         """Generate the complete PDF report."""
         print(f"Generating incident report for past {hours} hours...")
@@ -289,44 +389,88 @@ class IncidentReportGenerator:
         # Fetch data from database
         with get_db_context() as db:
             cutoff = datetime.utcnow() - timedelta(hours=hours)
+            in_window = Alert.timestamp >= cutoff
             
-            # Get alerts
-            alerts = db.query(Alert).filter(
-                Alert.timestamp >= cutoff
-            ).order_by(Alert.anomaly_score.desc()).all()
+            # Summary counts are aggregated in the database
+            total, high, suspicious, hosts, domains = db.query(
+                func.count(Alert.id),
+                func.sum(case((Alert.severity == 'HIGH', 1), else_=0)),
+                func.sum(case((Alert.severity == 'SUSPICIOUS', 1), else_=0)),
+                func.count(distinct(Alert.client_ip)),
+                func.count(distinct(Alert.domain))
+            ).filter(in_window).one()
             
-            if not alerts:
+            if not total:
                 print("No alerts found in the specified time period.")
                 return False
             
-            # Calculate summary data
             summary_data = {
-                'total_alerts': len(alerts),
-                'high_severity': len([a for a in alerts if a.severity == 'HIGH']),
-                'suspicious_severity': len([a for a in alerts if a.severity == 'SUSPICIOUS']),
-                'affected_hosts': len(set(a.client_ip for a in alerts)),
-                'malicious_domains': len(set(a.domain for a in alerts))
+                'total_alerts': total,
+                'high_severity': high or 0,
+                'suspicious_severity': suspicious or 0,
+                'affected_hosts': hosts,
+                'malicious_domains': domains
             }
             
             highest_severity = 'HIGH' if summary_data['high_severity'] > 0 else 'SUSPICIOUS'
             
-            # Build report
-            self.add_title_page(len(alerts), highest_severity)
-            self.add_executive_summary(summary_data)
-            self.add_alert_timeline_chart(alerts)
-            self.add_alert_details_table(alerts)
-            self.add_technical_analysis(alerts)
-            self.add_recommendations()
-            
-            # Generate PDF
-            self.doc.build(self.story)
+            # Only the rows and columns printed in the details table; the
+            # alert_data JSON payload is never loaded
+            top_alerts = [
+                row._asdict() for row in db.query(
+                    Alert.timestamp, Alert.domain, Alert.client_ip,
+                    Alert.anomaly_score, Alert.severity
+                ).filter(in_window).order_by(
+                    Alert.anomaly_score.desc()
+                ).limit(MAX_DETAIL_ROWS)
+            ]
             
-            print(f"✅ Report generated successfully: {self.output_path}")
-            print(f"   Total alerts: {len(alerts)}")
-            print(f"   High severity: {summary_data['high_severity']}")
-            print(f"   Affected hosts: {summary_data['affected_hosts']}")
+            # Timeline only needs three columns, kept as parallel arrays
+            timestamps, severities, scores = zip(*db.query(
+                Alert.timestamp, Alert.severity, Alert.anomaly_score
+            ).filter(in_window))
+            timeline_columns = {
+                'timestamp': np.array(timestamps, dtype='datetime64[us]'),
+                'severity': np.array(severities, dtype=object),
+                'score': np.array(scores, dtype=np.float32)
+            }
             
-            return True
+            # Feature averages are read out of the JSON payload in SQL
+            avg_entropy, avg_length = db.query(
+                func.avg(func.coalesce(Alert.alert_data[('features', 'entropy')].as_float(), 0.0)),
+                func.avg(func.coalesce(Alert.alert_data[('features', 'len_q')].as_float(), 0.0))
+            ).filter(in_window).one()
+        
+        # Build report: the title page ends with its own page break and the
+        # details start on a fresh page, matching the section grouping
+        self.add_title_page(total, highest_severity)
+        self.add_executive_summary(summary_data)
+        self.add_alert_timeline_chart(timeline_columns)
+        self.story.append(PageBreak())
+        self.add_alert_details_table(top_alerts)
+        self.add_technical_analysis(avg_entropy or 0.0, avg_length or 0.0)
+        
+        output_dir = Path(self.output_path).parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Dynamic pages are laid out in this process; the static pages are
+        # merged from the cached boilerplate PDF
+        from pypdf import PdfReader, PdfWriter
+        buffer = io.BytesIO()
+        create_document(buffer).build(self.story)
+        
+        writer = PdfWriter()
+        writer.append(PdfReader(buffer))
+        writer.append(PdfReader(io.BytesIO(get_boilerplate_pdf(str(output_dir)))))
+        with open(self.output_path, 'wb') as f:
+            writer.write(f)
+        
+        print(f"✅ Report generated successfully: {self.output_path}")
+        print(f"   Total alerts: {total}")
+        print(f"   High severity: {summary_data['high_severity']}")
+        print(f"   Affected hosts: {summary_data['affected_hosts']}")
+        
+        return True
 
 
 def main():
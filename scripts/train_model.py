@@ -4,10 +4,17 @@ Train Isolation Forest on baseline DNS traffic for anomaly detection.
 """
 
 import argparse
+import csv
+import hashlib
 import os
+import re
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
 from loguru import logger
 
 # Add parent directory to path
@@ -16,51 +23,103 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from agents.feature_extractor import FeatureExtractor
 from agents.scorer import AnomalyScorer
 
+# Bind9 query log format:
+# client @0x7f8b4c001f30 192.168.1.100#52847 (www.example.com): query: www.example.com IN A + (192.168.1.1)
+# OR
+# queries: info: client 192.168.1.100#52847: query: www.example.com IN A + (192.168.1.1)
+# Whitespace inside a record is [ \t] so a match never spans two lines when
+# the pattern is run over the whole file at once
+BIND_QUERY_PATTERN = re.compile(
+    r'client[ \t]+(?:@[^\s]+[ \t]+)?'     # Optional object pointer
+    r'(?P<client_ip>[\d\.]+)#\d+.*?'     # IP address
+    r'query:[ \t]+(?P<query>[^\s]+)\s'   # Query domain
+)
 
-def load_zeek_log(log_path: str) -> pd.DataFrame:
-    """Load and parse Zeek DNS log file."""
+# Rows parsed per read_csv chunk when streaming Zeek logs
+ZEEK_CHUNK_SIZE = 500_000
+
+
+def iter_zeek_log(log_path: str, chunksize: int = ZEEK_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Parse a Zeek DNS log file in chunks of at most chunksize rows."""
     logger.info(f"Loading Zeek log from: {log_path}")
     
-    records = []
+    # Basic Zeek dns.log has id.orig_h at column 2 and query at column 9;
+    # header/footer lines start with '#'
+    reader = pd.read_csv(
+        log_path,
+        sep='\t',
+        comment='#',
+        header=None,
+        usecols=[2, 9],
+        dtype=str,
+        na_filter=False,
+        quoting=csv.QUOTE_NONE,
+        on_bad_lines='skip',
+        compression='infer',
+        engine='c',
+        chunksize=chunksize
+    )
     
-    with open(log_path, 'r') as f:
-        for line in f:
-            # Skip comments
-            if line.startswith('#'):
-                continue
+    total = 0
+    with reader:
+        for chunk in reader:
+            chunk = chunk.rename(columns={9: 'query', 2: 'client_ip'})[['query', 'client_ip']]
             
-            fields = line.strip().split('\t')
+            # Filter out short lines and empty queries
+            chunk = chunk[
+                chunk['query'].notna() & (chunk['query'] != '') & (chunk['query'] != '-')
+            ].reset_index(drop=True)
             
-            # Basic Zeek dns.log has these fields
-            if len(fields) >= 10:
-                try:
-                    record = {
-                        'query': fields[9],  # query field
-                        'client_ip': fields[2],  # id.orig_h
-                    }
-                    
-                    # Filter out empty queries
-                    if record['query'] and record['query'] != '-':
-                        records.append(record)
-                except:
-                    continue
+            total += len(chunk)
+            yield chunk
     
-    df = pd.DataFrame(records)
-    logger.info(f"Loaded {len(df)} DNS records")
-    
-    return df
+    logger.info(f"Loaded {total} DNS records")
+
+
+def load_zeek_log(log_path: str) -> pd.DataFrame:
+    """Load and parse Zeek DNS log file."""
+    return pd.concat(iter_zeek_log(log_path), ignore_index=True)
 
 
 def load_json_log(log_path: str) -> pd.DataFrame:
     """Load JSON log file (one record per line)."""
     logger.info(f"Loading JSON log from: {log_path}")
 
-    df = pd.read_json(log_path, lines=True)
+    # Arrow's multi-threaded reader parses straight into columns; the
+    # required fields are pinned to strings and the rest are type-inferred
+    table = pa_json.read_json(
+        log_path,
+        read_options=pa_json.ReadOptions(use_threads=True, block_size=8 << 20),
+        parse_options=pa_json.ParseOptions(
+            explicit_schema=pa.schema([('query', pa.string()), ('client_ip', pa.string())])
+        )
+    )
 
     # Ensure required columns
-    if 'query' not in df.columns or 'client_ip' not in df.columns:
+    if table.num_rows and any(
+        table.column(name).null_count == table.num_rows for name in ('query', 'client_ip')
+    ):
         raise ValueError("JSON log must contain 'query' and 'client_ip' fields")
 
+    df = table.to_pandas()
+
+    # Arrow only infers timestamps without fractional seconds, so the
+    # isoformat() strings from generate_sample_logs arrive as text; the
+    # feature windows need real datetimes
+    if 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601')
+
+    logger.info(f"Loaded {len(df)} DNS records")
+
+    return df
+
+
+def load_parquet_log(log_path: str) -> pd.DataFrame:
+    """Load a Parquet log file, decoding only the query and client_ip columns."""
+    logger.info(f"Loading Parquet log from: {log_path}")
+
+    df = pd.read_parquet(log_path, columns=['query', 'client_ip'], engine='pyarrow')
+
     logger.info(f"Loaded {len(df)} DNS records")
 
     return df
@@ -70,47 +129,34 @@ def load_bind_log(log_path: str) -> pd.DataFrame:
     """Load and parse Bind9 query log file."""
     logger.info(f"Loading Bind9 log from: {log_path}")
 
-    import re
-
-    records = []
+    with open(log_path, 'r') as f:
+        text = f.read()
 
-    # Bind9 query log format:
-    # client @0x7f8b4c001f30 192.168.1.100#52847 (www.example.com): query: www.example.com IN A + (192.168.1.1)
-    # OR
-    # queries: info: client 192.168.1.100#52847: query: www.example.com IN A + (192.168.1.1)
+    # One scan over the whole buffer instead of a regex call per line
+    df = pd.DataFrame(
+        BIND_QUERY_PATTERN.findall(text),
+        columns=['client_ip', 'query']
+    )[['query', 'client_ip']]
 
-    query_pattern = re.compile(
-        r'client\s+(?:@[^\s]+\s+)?'  # Optional object pointer
-        r'([\d\.]+)#\d+.*?'           # IP address
-        r'query:\s+([^\s]+)\s+'       # Query domain
-    )
+    # Filter out localhost and empty queries
+    df = df[(df['query'] != '') & (df['client_ip'] != '127.0.0.1')].reset_index(drop=True)
 
-    with open(log_path, 'r') as f:
-        for line in f:
-            match = query_pattern.search(line)
-            if match:
-                client_ip = match.group(1)
-                query = match.group(2)
-
-                # Filter out localhost and empty queries
-                if query and client_ip and client_ip != '127.0.0.1':
-                    records.append({
-                        'query': query,
-                        'client_ip': client_ip
-                    })
-
-    df = pd.DataFrame(records)
     logger.info(f"Loaded {len(df)} DNS records")
 
     return df
 
 
-def generate_sample_data(num_samples: int = 1000) -> pd.DataFrame:
-    """Generate sample baseline DNS data for testing with high diversity."""
+def generate_sample_data(num_samples: int = 1000, seed: Optional[int] = None) -> pd.DataFrame:
+    """
+    Generate sample baseline DNS data for testing with high diversity.
+
+    Args:
+        num_samples: Number of records to generate
+        seed: Optional RNG seed for reproducible output
+    """
     logger.info(f"Generating {num_samples} sample DNS records")
 
-    import random
-    import string
+    rng = np.random.default_rng(seed)
 
     # Common legitimate domains (40% of traffic)
     common_domains = [
@@ -139,60 +185,128 @@ def generate_sample_data(num_samples: int = 1000) -> pd.DataFrame:
     tlds = ["com", "org", "net", "edu", "gov", "co.uk", "io", "ai", "dev", "app"]
     short_domains = ["cnn", "bbc", "msn", "espn", "imdb", "imgur", "twitch"]
 
-    # Subdomains with numbers/IDs (10% of traffic)
-    numbered_patterns = ["server{}", "node{}", "api-{}", "cdn{}", "cache{}",
-                         "lb{}", "web{}", "app{}", "db{}"]
-
-    records = []
-
-    for i in range(num_samples):
-        dice = random.random()
-
-        if dice < 0.40:
-            # Common domains
-            query = random.choice(common_domains)
-        elif dice < 0.55:
-            # Cloud services
-            query = random.choice(cloud_services)
-        elif dice < 0.75:
-            # Corporate/internal
-            prefix = random.choice(corporate_prefixes)
-            base = random.choice(corporate_bases)
-            query = f"{prefix}.{base}"
-        elif dice < 0.90:
-            # Short domains with various TLDs
-            domain = random.choice(short_domains)
-            tld = random.choice(tlds)
-            query = f"{domain}.{tld}"
-        else:
-            # Numbered/ID-based subdomains
-            pattern = random.choice(numbered_patterns)
-            num = random.randint(1, 99)
-            base = random.choice(["example.com", "service.net", "cloud.io"])
-            query = f"{pattern.format(num)}.{base}"
-
-        record = {
-            'query': query,
-            'client_ip': f"10.0.{random.randint(0, 255)}.{random.randint(1, 254)}"
-        }
-        records.append(record)
-
-    return pd.DataFrame(records)
-
-
-def extract_features_from_data(df: pd.DataFrame) -> pd.DataFrame:
-    """Extract features from DNS query data."""
-    logger.info("Extracting features from DNS queries...")
+    # Subdomains with numbers/IDs (10% of traffic), e.g. server42.example.com
+    numbered_prefixes = ["server", "node", "api-", "cdn", "cache",
+                         "lb", "web", "app", "db"]
+    numbered_bases = ["example.com", "service.net", "cloud.io"]
+
+    # Pick a traffic category per record, then fill each category in bulk
+    category = rng.choice(5, size=num_samples, p=[0.40, 0.15, 0.20, 0.15, 0.10])
+    queries = np.empty(num_samples, dtype=object)
+
+    def join(*parts):
+        result = parts[0]
+        for part in parts[1:]:
+            result = np.char.add(np.char.add(result, '.'), part)
+        return result
+
+    # Common domains
+    mask = category == 0
+    queries[mask] = rng.choice(common_domains, size=mask.sum())
+
+    # Cloud services
+    mask = category == 1
+    queries[mask] = rng.choice(cloud_services, size=mask.sum())
+
+    # Corporate/internal
+    mask = category == 2
+    n = mask.sum()
+    queries[mask] = join(rng.choice(corporate_prefixes, size=n), rng.choice(corporate_bases, size=n))
+
+    # Short domains with various TLDs
+    mask = category == 3
+    n = mask.sum()
+    queries[mask] = join(rng.choice(short_domains, size=n), rng.choice(tlds, size=n))
+
+    # Numbered/ID-based subdomains
+    mask = category == 4
+    n = mask.sum()
+    numbered = np.char.add(rng.choice(numbered_prefixes, size=n), rng.integers(1, 100, size=n).astype(str))
+    queries[mask] = join(numbered, rng.choice(numbered_bases, size=n))
+
+    client_ips = join(
+        np.full(num_samples, '10.0'),
+        rng.integers(0, 256, size=num_samples).astype(str),
+        rng.integers(1, 255, size=num_samples).astype(str)
+    )
+
+    return pd.DataFrame({'query': queries.astype(str), 'client_ip': client_ips})
+
+
+def get_feature_cache_path(log_path: str, cache_dir: str, window_size: int) -> Path:
+    """
+    Get the Parquet feature cache path for a log file.
     
+    The name is a hash of the log path followed by a hash of its mtime, the
+    window size and FeatureExtractor.FEATURE_VERSION, so entries for one log
+    share a prefix and any change to the inputs misses the cache.
+    """
+    log_key = hashlib.sha1(os.path.abspath(log_path).encode()).hexdigest()[:8]
+    state_key = hashlib.sha1(
+        f"{os.path.getmtime(log_path)}:{window_size}:{FeatureExtractor.FEATURE_VERSION}".encode()
+    ).hexdigest()[:8]
+    return Path(cache_dir) / f"features-{log_key}-{state_key}.parquet"
+
+
+def write_feature_cache(features_df: pd.DataFrame, cache_path: Path):
+    """Write the feature cache, replacing older entries for the same log."""
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        log_key = cache_path.stem.split('-')[1]
+        for stale in cache_path.parent.glob(f"features-{log_key}-*.parquet"):
+            stale.unlink(missing_ok=True)
+        features_df.to_parquet(cache_path, compression='zstd', engine='pyarrow')
+        logger.info(f"Cached features to: {cache_path}")
+    except Exception as e:
+        # The cache is only an optimization; training goes on without it
+        logger.warning(f"Could not write feature cache {cache_path}: {e}")
+
+
+def extract_features_from_data(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    log_path: Optional[str] = None,
+    cache_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Extract features from DNS query data, reusing cached features for unchanged logs.
+    
+    data may be a single DataFrame or an iterable of chunks (e.g. from
+    iter_zeek_log); chunks are only read if the feature cache misses.
+    """
+    # One extractor for all chunks so per-client windows carry across chunk boundaries
     extractor = FeatureExtractor(window_size=60)
     
-    # Convert to list of dicts for batch processing
-    queries = df.to_dict('records')
+    cache_path = None
+    if log_path and cache_dir:
+        cache_path = get_feature_cache_path(log_path, cache_dir, extractor.window_size)
+        if cache_path.exists():
+            features_df = pd.read_parquet(cache_path)
+            logger.info(f"Loaded {len(features_df)} cached feature rows from: {cache_path}")
+            return features_df
+
+    logger.info("Extracting features from DNS queries...")
     
-    # Extract features
-    features_df = extractor.extract_batch_features(queries)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    
+    feature_chunks = []
+    for df in chunks:
+        # Extract features straight from the columns
+        timestamps = None
+        if 'timestamp' in df.columns:
+            # Missing timestamps (NaT) fall back to now, like None
+            timestamps = df['timestamp'].astype(object).where(df['timestamp'].notna(), None).to_numpy()
+        feature_chunks.append(extractor.extract_column_features(
+            df['query'].to_numpy(dtype=object),
+            df['client_ip'].to_numpy(dtype=object),
+            timestamps
+        ))
+    
+    features_df = pd.concat(feature_chunks, ignore_index=True)
     
     logger.info(f"Extracted features for {len(features_df)} queries")
+
+    if cache_path is not None:
+        write_feature_cache(features_df, cache_path)
     
     return features_df
 
@@ -204,9 +318,11 @@ def train_model(features_df: pd.DataFrame, output_path: str, contamination: floa
     # Initialize scorer
     scorer = AnomalyScorer()
     scorer.model.contamination = contamination
+    # Build trees on all cores
+    scorer.model.n_jobs = -1
     
-    # Train on features
-    scorer.train(features_df)
+    # Train on features; the training pass also scores the baseline
+    features_df = scorer.fit_score(features_df)
     
     # Save model
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -214,11 +330,8 @@ def train_model(features_df: pd.DataFrame, output_path: str, contamination: floa
     
     logger.info(f"Model saved to: {output_path}")
     
-    # Evaluate on training data to show baseline
-    logger.info("Evaluating model on training data...")
-    features_df = scorer.score_batch(features_df)
-    
-    # Show statistics
+    # Show statistics of the scores from the training pass
+    logger.info("Training data score statistics:")
     logger.info(f"Mean anomaly score: {features_df['anomaly_score'].mean():.4f}")
     logger.info(f"Std anomaly score: {features_df['anomaly_score'].std():.4f}")
     logger.info(f"Max anomaly score: {features_df['anomaly_score'].max():.4f}")
@@ -235,12 +348,12 @@ def main():
     parser.add_argument(
         '--input',
         type=str,
-        help='Path to input log file (Zeek or JSON format)'
+        help='Path to input log file (Zeek, Bind9, JSON or Parquet format)'
     )
     parser.add_argument(
         '--format',
         type=str,
-        choices=['zeek', 'bind', 'json', 'sample'],
+        choices=['zeek', 'bind', 'json', 'parquet', 'sample'],
         default='zeek',
         help='Input log format (default: zeek)'
     )
@@ -262,6 +375,17 @@ def main():
         default=1000,
         help='Number of samples to generate (if using sample data)'
     )
+    parser.add_argument(
+        '--feature-cache',
+        type=str,
+        default=None,
+        help='Directory to cache extracted log features in (default: no caching)'
+    )
+    parser.add_argument(
+        '--to-parquet',
+        type=str,
+        help='Convert the input log to a Parquet file at this path and exit'
+    )
     
     args = parser.parse_args()
     
@@ -270,16 +394,26 @@ def main():
         logger.info("Generating sample baseline data...")
         df = generate_sample_data(args.num_samples)
     elif args.format == 'zeek':
-        df = load_zeek_log(args.input)
+        # Streamed in chunks for training; materialized only for conversion
+        df = load_zeek_log(args.input) if args.to_parquet else iter_zeek_log(args.input)
     elif args.format == 'bind':
         df = load_bind_log(args.input)
     elif args.format == 'json':
         df = load_json_log(args.input)
+    elif args.format == 'parquet':
+        df = load_parquet_log(args.input)
     else:
         raise ValueError(f"Unknown format: {args.format}")
     
-    # Extract features
-    features_df = extract_features_from_data(df)
+    # One-off conversion so later runs can use --format parquet
+    if args.to_parquet:
+        df[['query', 'client_ip']].to_parquet(args.to_parquet, compression='snappy', index=False)
+        logger.info(f"Wrote {len(df)} DNS records to: {args.to_parquet}")
+        return
+    
+    # Extract features (sample data is regenerated each run, so it is never cached)
+    log_path = args.input if args.format != 'sample' else None
+    features_df = extract_features_from_data(df, log_path, args.feature_cache)
     
     # Train model
     scorer = train_model(features_df, args.output, args.contamination)
@@ -6,19 +6,40 @@ Checks that all components are properly configured and running.
 import sys
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from loguru import logger
 
 # Suppress warnings
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# (name, url, timeout) for each service probed in parallel
+SERVICE_CHECKS = [
+    ("API Server", "http://localhost:8000", 5),
+    ("API Documentation", "http://localhost:8000/docs", 5),
+    ("Grafana Dashboard", "http://localhost:3000", 5),
+    ("Prometheus", "http://localhost:9090", 5),
+    ("PostgreSQL", "http://localhost:5432", 2),
+]
+MAX_CHECK_WORKERS = 8
 
-def check_service(name: str, url: str, timeout: int = 5) -> Tuple[bool, str]:
+
+def create_session() -> requests.Session:
+    """Create a keep-alive session shared by all checks."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=MAX_CHECK_WORKERS, pool_maxsize=MAX_CHECK_WORKERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def check_service(session: requests.Session, name: str, url: str, timeout: int = 5) -> Tuple[bool, str]:
     """Check if a service is responding."""
     try:
-        response = requests.get(url, timeout=timeout)
+        response = session.get(url, timeout=timeout)
         if response.status_code < 500:
             return True, f"✅ {name} is running"
         else:
@@ -31,10 +52,10 @@ def check_service(name: str, url: str, timeout: int = 5) -> Tuple[bool, str]:
         return False, f"❌ {name} error: {str(e)}"
 
 
-def check_api_health() -> Tuple[bool, str]:
+def check_api_health(session: requests.Session) -> Tuple[bool, str]:
     """Check API health endpoint."""
     try:
-        response = requests.get("http://localhost:8000/api/v1/health", timeout=10)
+        response = session.get("http://localhost:8000/api/v1/health", timeout=10)
         if response.status_code == 200:
             data = response.json()
             status = data.get('status', 'unknown')
@@ -66,14 +87,14 @@ def check_model_file() -> Tuple[bool, str]:
         return False, f"❌ ML model not found at {model_path}"
 
 
-def test_api_endpoint() -> Tuple[bool, str]:
+def test_api_endpoint(session: requests.Session) -> Tuple[bool, str]:
     """Test API with a sample query."""
     try:
         payload = {
             "query": "www.google.com",
             "client_ip": "192.168.1.100"
         }
-        response = requests.post(
+        response = session.post(
             "http://localhost:8000/api/v1/dns/analyze",
             json=payload,
             timeout=10
@@ -95,36 +116,17 @@ def main():
     logger.info("🔍 DNS TUNNELING DETECTION - INSTALLATION VERIFICATION")
     logger.info("=" * 70)
     
-    checks = []
+    session = create_session()
     
-    # Service checks
+    # Service checks run concurrently, so the wait is the slowest check
+    # rather than the sum of all timeouts; results keep SERVICE_CHECKS order
     logger.info("\n📡 Checking Services...")
     
-    checks.append(check_service(
-        "API Server",
-        "http://localhost:8000"
-    ))
-    
-    checks.append(check_service(
-        "API Documentation",
-        "http://localhost:8000/docs"
-    ))
-    
-    checks.append(check_service(
-        "Grafana Dashboard",
-        "http://localhost:3000"
-    ))
-    
-    checks.append(check_service(
-        "Prometheus",
-        "http://localhost:9090"
-    ))
-    
-    checks.append(check_service(
-        "PostgreSQL",
-        "http://localhost:5432",
-        timeout=2
-    ))
+    with ThreadPoolExecutor(max_workers=MAX_CHECK_WORKERS) as executor:
+        checks = list(executor.map(
+            lambda check: check_service(session, *check),
+            SERVICE_CHECKS
+        ))
     
     # Print service results
     for success, message in checks:
@@ -136,7 +138,7 @@ def main():
     # API-specific checks
     logger.info("\n🔧 Checking API Configuration...")
     
-    health_ok, health_msg = check_api_health()
+    health_ok, health_msg = check_api_health(session)
     logger.info(health_msg) if health_ok else logger.warning(health_msg)
     checks.append((health_ok, health_msg))
     
@@ -147,7 +149,7 @@ def main():
     # Functional test
     logger.info("\n🧪 Running Functional Tests...")
     
-    test_ok, test_msg = test_api_endpoint()
+    test_ok, test_msg = test_api_endpoint(session)
     logger.info(test_msg) if test_ok else logger.error(test_msg)
     checks.append((test_ok, test_msg))
     
@@ -13,12 +13,13 @@ from typing import Optional
 from datetime import datetime
 
 from loguru import logger
+import pandas as pd
 import uvicorn
 from fastapi import FastAPI
 
 # Import agents
 from agents.feature_extractor import FeatureExtractor
-from agents.scorer import AnomalyScorer
+from agents.scorer import AnomalyScorer, Severity
 from agents.alerting import AlertingAgent
 from agents.response import ResponseAgent
 from agents.collector import LogCollector
@@ -27,6 +28,11 @@ from agents.collector import LogCollector
 class DNSTunnelService:
     """Main service class that orchestrates all components."""
 
+    # Collected records waiting for analysis before tailing blocks
+    COLLECTOR_QUEUE_SIZE = 10000
+    # Most records drained from the queue into one score_batch call
+    COLLECTOR_BATCH_SIZE = 256
+
     def __init__(self, config_path: str = "config.yaml"):
         self.config_path = config_path
         self.config = None
@@ -40,6 +46,7 @@ class DNSTunnelService:
         self.alerting_agent: Optional[AlertingAgent] = None
         self.response_agent: Optional[ResponseAgent] = None
         self.log_collector: Optional[LogCollector] = None
+        self.domain_whitelist: frozenset = frozenset()
 
         # Setup logging
         self._setup_logging()
@@ -52,20 +59,30 @@ class DNSTunnelService:
         # Remove default handler
         logger.remove()
 
+        # Sinks are enqueued so formatting and writes happen on loguru's
+        # worker thread instead of the event loop; diagnose=False skips
+        # rendering local variables into exception traces
+
         # Add file handler
         logger.add(
             log_dir / "dns_tunnel_{time}.log",
             rotation="10 MB",
             retention="30 days",
             level="INFO",
-            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
+            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}",
+            enqueue=True,
+            backtrace=False,
+            diagnose=False
         )
 
         # Add console handler
         logger.add(
             sys.stdout,
             level="INFO",
-            format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}"
+            format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}",
+            enqueue=True,
+            backtrace=False,
+            diagnose=False
         )
 
     def load_config(self):
@@ -77,8 +94,10 @@ class DNSTunnelService:
             logger.error("Please run the installer first: python install.py")
             sys.exit(1)
 
+        # libyaml's C loader when PyYAML was built with it
+        loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
         with open(self.config_path, 'r') as f:
-            self.config = yaml.safe_load(f)
+            self.config = yaml.load(f, Loader=loader)
 
         logger.info("Configuration loaded successfully")
         return self.config
@@ -121,11 +140,17 @@ class DNSTunnelService:
         )
         logger.info("✓ Response Agent initialized")
 
+        # Trusted names are matched exactly (case-folded, no trailing dot);
+        # their subdomains are still scored since that is where tunnels live
+        self.domain_whitelist = frozenset(
+            domain.lower().rstrip('.')
+            for domain in self.config.get('security', {}).get('domain_whitelist') or []
+        )
+
         # Log Collector (if enabled)
         if self.config['collector']['enabled']:
             self.log_collector = LogCollector(
-                log_sources=self.config['collector']['sources'],
-                api_endpoint=f"http://localhost:{self.config['api']['port']}/api/v1/dns/analyze"
+                queue=asyncio.Queue(maxsize=self.COLLECTOR_QUEUE_SIZE)
             )
             logger.info("✓ Log Collector initialized")
 
@@ -133,17 +158,18 @@ class DNSTunnelService:
 
     def _create_default_model(self, model_path: str):
         """Create a default ML model if none exists."""
-        from sklearn.ensemble import IsolationForest
-        import joblib
+        from scripts.train_model import (
+            generate_sample_data, extract_features_from_data, train_model
+        )
 
         logger.info("Training default model with sample data...")
 
         # Create models directory
         Path(model_path).parent.mkdir(parents=True, exist_ok=True)
 
-        # Train on sample normal data
-        from scripts.train_model import train_model
-        train_model(format='sample', num_samples=5000, output_path=model_path)
+        # Train on sample normal data (generated column-wise with numpy.random)
+        sample_df = generate_sample_data(num_samples=5000)
+        train_model(extract_features_from_data(sample_df), output_path=model_path)
 
         logger.info(f"Default model created at {model_path}")
 
@@ -151,11 +177,14 @@ class DNSTunnelService:
         """Start the FastAPI server."""
         from api.main import app
 
+        # Per-request access lines are off by default; they are formatted and
+        # written on the event loop for every analyzed query
         config = uvicorn.Config(
             app,
             host=self.config['api']['host'],
             port=self.config['api']['port'],
-            log_level="info"
+            log_level="info",
+            access_log=self.config['api'].get('access_log', False)
         )
         server = uvicorn.Server(config)
 
@@ -169,13 +198,105 @@ class DNSTunnelService:
 
         logger.info("Starting log collector...")
 
-        while self.running:
-            try:
-                await self.log_collector.collect_and_analyze()
-                await asyncio.sleep(1)  # Process logs every second
-            except Exception as e:
-                logger.error(f"Error in log collector: {e}")
-                await asyncio.sleep(5)
+        tailers = {
+            'zeek': self.log_collector.tail_zeek_log,
+            'json': self.log_collector.ingest_json_log,
+        }
+        tail_tasks = set()
+        for source in self.config['collector'].get('sources') or []:
+            tail = tailers.get(source.get('format', 'zeek'))
+            if source.get('type') != 'file' or tail is None:
+                logger.warning(f"Unsupported collector source: {source}")
+                continue
+            tail_tasks.add(asyncio.create_task(tail(source['path']), name=source['path']))
+
+        if not tail_tasks:
+            logger.warning("No usable log collector sources configured; log collector not started")
+            return
+
+        # Block until the tailers queue a record instead of polling, then
+        # drain whatever else is already waiting into the same batch. The
+        # tailers are watched too, so the loop wakes up when they exit
+        # (a failed tailer or stop()) rather than waiting on an empty queue
+        queue = self.log_collector.queue
+        try:
+            while self.running and tail_tasks:
+                next_record = asyncio.create_task(queue.get())
+                done, _ = await asyncio.wait(
+                    tail_tasks | {next_record}, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done - {next_record}:
+                    tail_tasks.discard(task)
+                    self._log_tailer_exit(task)
+
+                if next_record not in done:
+                    next_record.cancel()
+                    continue
+
+                await self._analyze_batch([next_record.result()])
+
+            # Records queued before the last tailer exited are still analyzed
+            while not queue.empty():
+                await self._analyze_batch([])
+        finally:
+            for task in tail_tasks:
+                task.cancel()
+
+        if self.running:
+            logger.error("All log sources stopped; log collector is no longer running")
+
+    async def _analyze_batch(self, records):
+        """Top up records with whatever is already queued and analyze them."""
+        queue = self.log_collector.queue
+        while len(records) < self.COLLECTOR_BATCH_SIZE and not queue.empty():
+            records.append(queue.get_nowait())
+
+        try:
+            await self._analyze_records(records)
+        except Exception as e:
+            logger.error(f"Error in log collector: {e}")
+
+    def _log_tailer_exit(self, task: asyncio.Task):
+        """Log why a log tailer task finished."""
+        if task.cancelled():
+            return
+        if task.exception():
+            logger.error(f"Log tailer for {task.get_name()} failed: {task.exception()}")
+        elif self.running:
+            logger.warning(f"Log tailer for {task.get_name()} stopped")
+
+    async def _analyze_records(self, records):
+        """Score collected records in one batch and alert on anomalous ones."""
+        from api.main import record_alert
+
+        features_df = self.feature_extractor.extract_batch_features(records)
+
+        # Whitelisted queries still pass through the extractor so per-client
+        # windows stay complete; only model scoring is skipped for them
+        if self.domain_whitelist:
+            trusted = features_df['query'].str.lower().str.rstrip('.').isin(self.domain_whitelist)
+            features_df = features_df[~trusted].reset_index(drop=True)
+            if features_df.empty:
+                return
+
+        features_df = self.scorer.score_batch(features_df)
+
+        # Same alert payload, persistence and response path as the API
+        anomalies = features_df[features_df['severity'] != Severity.NORMAL]
+        feature_rows = anomalies[self.scorer.feature_names].to_dict('records')
+        for row, features in zip(anomalies.itertuples(index=False), feature_rows):
+            alert_data = {
+                'severity': Severity(row.severity).value,
+                'anomaly_score': float(row.anomaly_score),
+                'domain': row.query,
+                'client_ip': row.client_ip,
+                # Naive and tz-aware records in one batch leave this column as
+                # plain datetimes, otherwise it holds pandas Timestamps
+                'timestamp': pd.Timestamp(row.timestamp).to_pydatetime(),
+                'features': features
+            }
+            await record_alert(alert_data, self.alerting_agent, self.response_agent)
 
     async def start_async(self):
         """Start all async components."""
@@ -209,7 +330,12 @@ class DNSTunnelService:
             logger.info(f"API available at: http://{self.config['api']['host']}:{self.config['api']['port']}")
             logger.info("Press Ctrl+C to stop")
 
-            # Run async event loop
+            # Run async event loop, on uvloop where it is installed (not on Windows)
+            try:
+                import uvloop
+                asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            except ImportError:
+                pass
             asyncio.run(self.start_async())
 
         except KeyboardInterrupt:
@@ -226,7 +352,7 @@ class DNSTunnelService:
 
         # Cleanup
         if self.log_collector:
-            self.log_collector.close()
+            self.log_collector.stop()
 
         logger.info("Service stopped")
         sys.exit(0)
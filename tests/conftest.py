@@ -0,0 +1,33 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+from agents.scorer import AnomalyScorer
+from agents.feature_extractor import FeatureExtractor
+
+# Repeated benign queries from one client
+BASELINE_QUERIES = ["www.example.com"] * 100
+BASELINE_CLIENT_IPS = ["192.168.1.100"] * 100
+
+
+@pytest.fixture
+def baseline_extractor():
+    """Fresh extractor whose client windows hold the baseline queries."""
+    extractor = FeatureExtractor()
+    extractor.extract_column_features(BASELINE_QUERIES, BASELINE_CLIENT_IPS)
+    return extractor
+
+
+@pytest.fixture(scope="session")
+def baseline_features():
+    """Baseline feature frame of repeated benign queries."""
+    return FeatureExtractor().extract_column_features(BASELINE_QUERIES, BASELINE_CLIENT_IPS)
+
+
+@pytest.fixture(scope="session")
+def trained_scorer(baseline_features):
+    """Scorer fitted once on the baseline and shared by all tests."""
+    scorer = AnomalyScorer()
+    scorer.train(baseline_features)
+    return scorer
@@ -0,0 +1,49 @@
+"""
+Unit tests for Log Collector Agent
+"""
+
+import asyncio
+import pytest
+from agents.collector import LogCollector
+
+
+ZEEK_LINE = (
+    "1700000000.123456\tC1234\t192.168.1.100\t54321\t8.8.8.8\t53\tudp\t12345\t0.025\t"
+    "www.google.com\t1\tC_INTERNET\t1\tA\t0\tNOERROR\tF\tF\tT\tT\t0\t142.250.80.46\t300\tF\n"
+)
+
+
+@pytest.mark.asyncio
+async def test_tail_holds_back_partial_line(tmp_path):
+    """Test that a line written in two parts is emitted once, complete."""
+    log_path = tmp_path / "dns.log"
+    log_path.write_text("#fields\tts\n")
+    
+    queue = asyncio.Queue()
+    collector = LogCollector(queue=queue)
+    task = asyncio.create_task(collector.tail_zeek_log(str(log_path), interval=0.05))
+    await asyncio.sleep(0.2)
+    
+    split = len(ZEEK_LINE) // 2
+    with open(log_path, 'a') as f:
+        f.write(ZEEK_LINE[:split])
+    await asyncio.sleep(0.2)
+    
+    # The first half has no newline yet, so nothing is emitted
+    assert queue.empty()
+    
+    with open(log_path, 'a') as f:
+        f.write(ZEEK_LINE[split:])
+    record = await asyncio.wait_for(queue.get(), timeout=2)
+    
+    collector.stop()
+    await asyncio.wait_for(task, timeout=2)
+    
+    assert record['query'] == "www.google.com"
+    assert record['client_ip'] == "192.168.1.100"
+    assert record['rejected'] == "F"
+    assert queue.empty()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
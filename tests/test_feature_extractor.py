@@ -3,7 +3,7 @@ Unit tests for Feature Extraction Agent
 """
 
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
 from agents.feature_extractor import FeatureExtractor
 
 
@@ -70,6 +70,48 @@ def test_empty_query():
     assert features['num_labels'] == 2
 
 
+# Queries covering the vectorized kernels' edge cases
+EDGE_CASE_QUERIES = [
+    "www.google.com",
+    "a3f8b2c9d4e5f6a7b8c9d0e1f2a3b4c5.evil.com",
+    "",
+    ".",
+    "...",
+    "bücher.example.de",
+    "例え.テスト",
+    "emoji-\U0001F600.example.com",
+    "under_score-dash.example.com",
+    "www.google.com",
+]
+
+
+def test_batch_entropy_matches_scalar():
+    """Test that vectorized entropy matches the per-query calculation."""
+    extractor = FeatureExtractor()
+    
+    batch = extractor._batch_entropy(EDGE_CASE_QUERIES)
+    
+    for query, entropy in zip(EDGE_CASE_QUERIES, batch):
+        assert entropy == pytest.approx(FeatureExtractor._calculate_entropy(query), abs=1e-12)
+
+
+def test_column_features_match_per_row():
+    """Test that column-wise extraction matches per-row extract_features."""
+    start = datetime(2024, 1, 1, 12, 0, 0)
+    timestamps = [start + timedelta(seconds=7 * i) for i in range(len(EDGE_CASE_QUERIES))]
+    client_ips = ["10.0.0.1", "10.0.0.2"] * (len(EDGE_CASE_QUERIES) // 2)
+    
+    column_df = FeatureExtractor().extract_column_features(
+        EDGE_CASE_QUERIES, client_ips, timestamps
+    )
+    
+    row_extractor = FeatureExtractor()
+    for i, (query, client_ip, timestamp) in enumerate(zip(EDGE_CASE_QUERIES, client_ips, timestamps)):
+        expected = row_extractor.extract_features(query, client_ip, timestamp)
+        for name in row_extractor.get_feature_names():
+            assert column_df[name].iloc[i] == pytest.approx(expected[name], abs=1e-12), (query, name)
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,81 @@
+"""
+Unit tests for the DNS Tunnel Detection Service collector path
+"""
+
+import copy
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import api.database
+from api.models import Base, Alert
+from agents.alerting import AlertingAgent
+from agents.feature_extractor import FeatureExtractor
+from agents.response import ResponseAgent
+from service.dns_tunnel_service import DNSTunnelService
+
+
+@pytest.fixture
+def alert_db(monkeypatch):
+    """In-memory database behind get_db_context."""
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(api.database, "SessionLocal", session_factory)
+    return session_factory
+
+
+@pytest.fixture
+def service(monkeypatch, trained_scorer):
+    """Service with detection components wired up and no notification channels."""
+    for name in ("SLACK_WEBHOOK_URL", "TEAMS_WEBHOOK_URL", "JIRA_URL", "EMAIL_FROM", "EMAIL_TO"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(DNSTunnelService, "_setup_logging", lambda self: None)
+    
+    service = DNSTunnelService()
+    service.feature_extractor = FeatureExtractor()
+    
+    # Every query is anomalous at a zero threshold
+    service.scorer = copy.copy(trained_scorer)
+    service.scorer.threshold_suspicious = 0.0
+    service.scorer.threshold_high = 0.0
+    
+    service.alerting_agent = AlertingAgent(min_score_to_alert=0.0)
+    service.response_agent = ResponseAgent(auto_response_enabled=False)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_analyze_records_mixed_timezones(service, alert_db):
+    """Test that a batch of naive and tz-aware timestamps stores every alert."""
+    records = [
+        {
+            'query': "www.example.com",
+            'client_ip': "192.168.1.10",
+            'timestamp': datetime.fromtimestamp(1700000000.5)
+        },
+        {
+            'query': "a3f8b2c9d4e5f6a7b8c9d0e1f2a3b4c5.evil.com",
+            'client_ip': "10.0.1.50",
+            'timestamp': datetime.fromisoformat("2023-11-14T22:13:20+00:00")
+        },
+    ]
+    
+    await service._analyze_records(records)
+    
+    with alert_db() as db:
+        alerts = db.query(Alert).order_by(Alert.client_ip).all()
+    
+    assert [alert.domain for alert in alerts] == [
+        "a3f8b2c9d4e5f6a7b8c9d0e1f2a3b4c5.evil.com", "www.example.com"
+    ]
+    assert all(alert.alert_data['features'] for alert in alerts)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
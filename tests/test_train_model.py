@@ -0,0 +1,26 @@
+"""
+Unit tests for the model training script loaders
+"""
+
+import pytest
+from scripts.generate_sample_logs import (
+    generate_benign_queries, generate_tunneling_queries, save_as_json
+)
+from scripts.train_model import load_json_log, extract_features_from_data
+
+
+def test_json_log_features(tmp_path):
+    """Test that generated JSON logs load and extract features."""
+    log_path = tmp_path / "sample.json"
+    save_as_json(generate_benign_queries(50) + generate_tunneling_queries(10), str(log_path))
+    
+    df = load_json_log(str(log_path))
+    features_df = extract_features_from_data(df)
+    
+    assert len(features_df) == 60
+    assert features_df['qps'].notna().all()
+    assert features_df['timestamp'].min().year > 2000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])